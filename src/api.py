@@ -1,10 +1,15 @@
-import yfinance as yf
-import json
+import atexit
+import mmap
+import os
+import orjson
+from curl_cffi import requests as curl_requests
+import threading
+import time
 from datetime import datetime
 from pathlib import Path
 import csv
-from util.util import normalize_symbol
-from models import Quote, Point, Series
+from util.util import normalize_symbol, log_warn
+from models import Quote, Series
 
 
 
@@ -16,13 +21,127 @@ HISTORY_FILE = Path("src/data/history.csv")
 
 
 HISTORY_FILE = Path("history.csv")
+HISTORY_FIELDS = ["symbol", "price", "change", "change_percent", "timestamp", "source"]
+# Offline lookups read history.csv backwards in blocks before resorting to a full scan
+HISTORY_TAIL_BLOCK = 4096
+HISTORY_TAIL_BYTES = 64 * 1024
+
+# Yahoo's spark endpoint returns the latest price for many symbols in one request
+SPARK_URL = "https://query1.finance.yahoo.com/v8/finance/spark"
+SPARK_BATCH_SIZE = 20
+
+# Default timeout (seconds) for requests on the shared session
+HTTP_TIMEOUT = 5.0
+
+# Upper bound on cached yf.Ticker objects (one per symbol)
+TICKER_CACHE_SIZE = 512
+
+# In-memory copy of cache.json, re-parsed only when the file's mtime changes
+# and written back by flush_cache()
+_CACHE: dict | None = None
+_CACHE_MTIME = 0
+_CACHE_DIRTY = False
+_CACHE_LOCK = threading.Lock()
+
+
+def _read_cache_file() -> dict:
+    """Parse cache.json through a read-only memory map."""
+    with CACHE_FILE.open("rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return orjson.loads(view)
+
+
+def _cache() -> dict:
+    """
+    Return the in-memory cache, (re)loading cache.json when it changed on disk
+    and we hold no unflushed entries. Call with _CACHE_LOCK held.
+    """
+    global _CACHE, _CACHE_MTIME
+    try:
+        stat = CACHE_FILE.stat()
+    except OSError:
+        if _CACHE is None:
+            _CACHE = {}
+        return _CACHE
+    if _CACHE is None or (stat.st_mtime_ns != _CACHE_MTIME and not _CACHE_DIRTY):
+        try:
+            # mmap refuses empty files
+            _CACHE = _read_cache_file() if stat.st_size else {}
+        except Exception:
+            if _CACHE is None:
+                _CACHE = {}
+        _CACHE_MTIME = stat.st_mtime_ns
+    return _CACHE
+
+
+def cache_get(symbol: str) -> dict | None:
+    """Return the cache.json entry for symbol, if any."""
+    with _CACHE_LOCK:
+        return _cache().get(symbol)
+
+
+def cache_put(symbol: str, entry: dict):
+    """Store a cache.json entry for symbol; it reaches disk on the next flush_cache()."""
+    global _CACHE_DIRTY
+    with _CACHE_LOCK:
+        _cache()[symbol] = entry
+        _CACHE_DIRTY = True
+
+
+def flush_cache():
+    """Write the in-memory cache to cache.json if it changed since the last flush."""
+    global _CACHE_DIRTY, _CACHE_MTIME
+    with _CACHE_LOCK:
+        if not _CACHE_DIRTY:
+            return
+        CACHE_FILE.write_bytes(orjson.dumps(_CACHE))
+        _CACHE_MTIME = CACHE_FILE.stat().st_mtime_ns
+        _CACHE_DIRTY = False
+
+
+atexit.register(flush_cache)
 
 class YahooFinanceClient:
+    def __init__(self, ttl_quote: float = 30.0, ttl_series: float = 600.0):
+        # Seconds a live quote / daily series is reused before hitting the network again
+        self.ttl_quote = ttl_quote
+        self.ttl_series = ttl_series
+        # key -> (expires_at, value); see _memo_get()/_memo_put()
+        self._memo = {}
+        # One pooled, keep-alive session shared by yfinance and the spark batch calls.
+        # yfinance only accepts curl_cffi sessions, so requests.Session can't be used here.
+        # Impersonating Chrome also makes curl negotiate HTTP/2 with Yahoo.
+        self._session = curl_requests.Session(impersonate="chrome", timeout=HTTP_TIMEOUT)
+        # symbol -> (yf.Ticker, created_at); see _ticker()
+        self._tickers = {}
+        # Serializes cache/history writes when quotes are fetched from several threads
+        self._lock = threading.Lock()
+
+        # history.csv stays open for the client's lifetime; rows are block-buffered
+        HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
+        self._hist_fh = HISTORY_FILE.open("a", newline="", buffering=1 << 16)
+        self._hist_writer = csv.writer(self._hist_fh)
+        if HISTORY_FILE.stat().st_size == 0:
+            self._hist_writer.writerow(HISTORY_FIELDS)
+        atexit.register(self.close)
+
+    def close(self):
+        """Flush buffered history rows and release the history file and HTTP session."""
+        with self._lock:
+            if not self._hist_fh.closed:
+                self._hist_fh.close()
+        self._session.close()
+
     def get_quote(self, symbol: str) -> Quote:
         """Fetch a live quote from YahooFinance. Falls back to cache.json or history.csv if offline."""
+        yf_symbol = normalize_symbol(symbol)
+        quote = self._memo_get(("quote", yf_symbol))
+        if quote is not None:
+            return quote
+
         try:
-            yf_symbol = normalize_symbol(symbol)
-            ticker = yf.Ticker(yf_symbol)
+            ticker = self._ticker(yf_symbol)
 
             # Try fast_info first
             info = getattr(ticker, "fast_info", {})
@@ -34,8 +153,8 @@ class YahooFinanceClient:
                 if not hist.empty:
                     price = hist["Close"].iloc[-1]
 
-            if price is None:
-                price = 0.0
+            # history() yields numpy.float64, which orjson refuses to serialize
+            price = float(price) if price is not None else 0.0
 
             quote = Quote(
                 symbol=yf_symbol,
@@ -45,8 +164,10 @@ class YahooFinanceClient:
                 last_refreshed=datetime.now(),
                 source="yfinance"
             )
-            self._save_cache(yf_symbol, quote)
-            self._save_history(quote)
+            with self._lock:
+                self._save_cache(yf_symbol, quote)
+                self._save_history(quote)
+            self._memo_put(("quote", yf_symbol), quote, self.ttl_quote)
             return quote
 
         except Exception as e:
@@ -55,88 +176,205 @@ class YahooFinanceClient:
             cached = self._load_cache(norm)
             if cached:
                 return cached
-            if HISTORY_FILE.exists():
-                with HISTORY_FILE.open() as f:
-                    rows = list(csv.DictReader(f))
-                    for row in reversed(rows):
-                        if row["symbol"] == norm:
-                            return Quote(
-                                symbol=row["symbol"],
-                                price=float(row["price"]),
-                                change=float(row.get("change", 0.0)),
-                                change_percent=float(row.get("change_percent", 0.0)),
-                                last_refreshed=datetime.strptime(row["timestamp"], "%Y-%m-%d %H:%M:%S"),
-                                source="offline-history"
-                            )
+            with self._lock:
+                if not self._hist_fh.closed:
+                    self._hist_fh.flush()
+            row = self._find_history_row(norm) if HISTORY_FILE.exists() else None
+            if row:
+                return Quote(
+                    symbol=row["symbol"],
+                    price=float(row["price"]),
+                    change=float(row.get("change", 0.0)),
+                    change_percent=float(row.get("change_percent", 0.0)),
+                    last_refreshed=datetime.fromisoformat(row["timestamp"]),
+                    source="offline-history"
+                )
             raise RuntimeError(f"No offline data available for {symbol}: {e}")
 
+    def _ticker(self, yf_symbol: str):
+        """
+        Return a cached yf.Ticker for yf_symbol. Entries are rebuilt after
+        ttl_quote seconds: a Ticker memoizes its fast_info prices and would
+        otherwise keep serving the first quote it fetched once the memo expires.
+        """
+        import yfinance as yf  # deferred: importing yfinance/pandas is slow
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._tickers.get(yf_symbol)
+        if entry is not None and now - entry[1] < self.ttl_quote:
+            return entry[0]
 
+        ticker = yf.Ticker(yf_symbol, session=self._session)
+        with self._lock:
+            self._tickers.pop(yf_symbol, None)
+            if len(self._tickers) >= TICKER_CACHE_SIZE:
+                # dicts keep insertion order, so the first key is the oldest entry
+                self._tickers.pop(next(iter(self._tickers)))
+            self._tickers[yf_symbol] = (ticker, now)
+        return ticker
 
-    def get_daily(self, symbol: str, range: str = "1mo") -> Series:
+    def get_quotes(self, symbols: list[str]) -> dict[str, Quote]:
         """
-        Fetch daily historical series for a symbol.
-        Returns a Series of Points (time, close).
+        Fetch live quotes for many symbols at once via Yahoo's spark endpoint.
+        Symbols are sent in chunks of SPARK_BATCH_SIZE, so N symbols cost
+        ceil(N / SPARK_BATCH_SIZE) requests. Symbols Yahoo has no price for, or
+        whose chunk failed, are left out of the returned dict; callers fall back
+        to get_quote for them.
         """
+        quotes = {}
+        yf_symbols = []
+        for sym in dict.fromkeys(normalize_symbol(s) for s in symbols):
+            quote = self._memo_get(("quote", sym))
+            if quote is not None:
+                quotes[sym] = quote
+            else:
+                yf_symbols.append(sym)
+
+        chunks = [yf_symbols[i:i + SPARK_BATCH_SIZE] for i in range(0, len(yf_symbols), SPARK_BATCH_SIZE)]
+        for chunk in chunks:
+            try:
+                quotes.update((q.symbol, q) for q in self._fetch_spark_chunk(chunk))
+            except Exception as e:
+                # One bad chunk shouldn't discard the prices the others returned
+                log_warn(f"spark chunk {chunk} failed: {e}")
+        return quotes
+
+    def _fetch_spark_chunk(self, chunk: list[str]) -> list[Quote]:
+        resp = self._session.get(
+            SPARK_URL,
+            params={"symbols": ",".join(chunk), "range": "1d", "interval": "1d"},
+        )
+        resp.raise_for_status()
+        quotes = []
+        for result in resp.json()["spark"]["result"]:
+            response = result.get("response") or [{}]
+            price = response[0].get("meta", {}).get("regularMarketPrice")
+            if price is None:
+                continue
+            quote = Quote(
+                symbol=result["symbol"],
+                price=price,
+                change=0.0,
+                change_percent=0.0,
+                last_refreshed=datetime.now(),
+                source="yfinance"
+            )
+            with self._lock:
+                self._save_cache(quote.symbol, quote)
+                self._save_history(quote)
+            self._memo_put(("quote", quote.symbol), quote, self.ttl_quote)
+            quotes.append(quote)
+        return quotes
+
+    def get_daily(self, symbol: str, range: str = "1mo", interval: str = "1d") -> Series:
+        """
+        Fetch historical series for a symbol, one bar per interval (daily by default).
+        Returns a Series of numpy arrays (times, closes).
+        """
+        import numpy as np
+
+        key = ("series", symbol, range, interval)
+        series = self._memo_get(key)
+        if series is not None:
+            return series
+
         try:
-            hist = yf.Ticker(symbol).history(period=range)
-            points = [
-                Point(time=index.to_pydatetime(), close=row["Close"])
-                for index, row in hist.iterrows()
-            ]
-            return Series(symbol=symbol, points=points)
+            hist = self._ticker(symbol).history(period=range, interval=interval)
+            index = hist.index
+            if index.tz is not None:
+                # Keep the exchange's local dates rather than converting to UTC
+                index = index.tz_localize(None)
+            series = Series(
+                symbol=symbol,
+                times=index.to_numpy().astype("datetime64[s]"),
+                closes=hist["Close"].to_numpy(dtype=np.float64),
+            )
+            if len(series.closes):
+                self._memo_put(key, series, self.ttl_series)
+            return series
         except Exception:
             # Offline mode: no chart data available
-            return Series(symbol=symbol, points=[])
+            return Series(
+                symbol=symbol,
+                times=np.array([], dtype="datetime64[s]"),
+                closes=np.array([], dtype=np.float64),
+            )
+
+    # --- In-process TTL cache ---
+    def _memo_get(self, key):
+        entry = self._memo.get(key)
+        if entry is not None and time.monotonic() < entry[0]:
+            return entry[1]
+        return None
+
+    def _memo_put(self, key, value, ttl: float):
+        self._memo[key] = (time.monotonic() + ttl, value)
 
     # --- Cache methods ---
     def _save_cache(self, symbol: str, quote: Quote):
-        cache = {}
-        if CACHE_FILE.exists():
-            try:
-                cache = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
-            except Exception:
-                cache = {}
-        cache[symbol] = {
+        cache_put(symbol, {
             "symbol": quote.symbol,
             "price": quote.price,
             "change": quote.change,
             "change_percent": quote.change_percent,
             "last_refreshed": quote.last_refreshed.isoformat(),
             "source": quote.source
-        }
-        CACHE_FILE.write_text(json.dumps(cache), encoding="utf-8")
+        })
 
     def _load_cache(self, symbol: str) -> Quote | None:
-        if CACHE_FILE.exists():
+        entry = cache_get(symbol)
+        if entry:
             try:
-                cache = json.loads(CACHE_FILE.read_text(encoding="utf-8"))
-                if symbol in cache:
-                    entry = cache[symbol]
-                    return Quote(
-                        symbol=entry["symbol"],
-                        price=entry["price"],
-                        change=entry["change"],
-                        change_percent=entry["change_percent"],
-                        last_refreshed=datetime.fromisoformat(entry["last_refreshed"]),
-                        source="cache"
-                    )
+                return Quote(
+                    symbol=entry["symbol"],
+                    price=entry["price"],
+                    change=entry["change"],
+                    change_percent=entry["change_percent"],
+                    last_refreshed=datetime.fromisoformat(entry["last_refreshed"]),
+                    source="cache"
+                )
             except Exception:
                 pass
         return None
 
     # --- History methods ---
+    def _find_history_row(self, symbol: str) -> dict | None:
+        """
+        Return the most recent history.csv row for symbol. The file is read
+        backwards from the end, so the usual case touches only the last block;
+        if the last HISTORY_TAIL_BYTES hold no match, fall back to a full scan.
+        """
+        with HISTORY_FILE.open("rb") as f:
+            end = pos = f.seek(0, os.SEEK_END)
+            partial = b""
+            while pos > 0 and end - pos < HISTORY_TAIL_BYTES:
+                step = min(HISTORY_TAIL_BLOCK, pos)
+                pos -= step
+                f.seek(pos)
+                lines = (f.read(step) + partial).split(b"\n")
+                # The first piece may start mid-line unless we reached the start of the file
+                partial = lines.pop(0) if pos > 0 else b""
+                for line in reversed(lines):
+                    row = next(csv.reader([line.decode("utf-8")]), None)
+                    if row and row[0] == symbol:
+                        return dict(zip(HISTORY_FIELDS, row))
+            if pos == 0:
+                return None
+
+        with HISTORY_FILE.open(newline="") as f:
+            for row in reversed(list(csv.DictReader(f))):
+                if row["symbol"] == symbol:
+                    return row
+        return None
+
     def _save_history(self, quote: Quote):
-        HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
-        write_header = not HISTORY_FILE.exists()
-        with HISTORY_FILE.open("a", newline="") as f:
-            writer = csv.writer(f)
-            if write_header:
-                writer.writerow(["symbol", "price", "change", "change_percent", "timestamp", "source"])
-            writer.writerow([
-                quote.symbol,
-                quote.price,
-                quote.change,
-                quote.change_percent,
-                quote.last_refreshed.strftime("%Y-%m-%d %H:%M:%S"),
-                quote.source
-            ])
\ No newline at end of file
+        self._hist_writer.writerow([
+            quote.symbol,
+            quote.price,
+            quote.change,
+            quote.change_percent,
+            # Same "YYYY-MM-DD HH:MM:SS" layout as before, readable by fromisoformat
+            quote.last_refreshed.isoformat(sep=" ", timespec="seconds"),
+            quote.source
+        ])
\ No newline at end of file
@@ -1,8 +1,11 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List
+from typing import TYPE_CHECKING
 
-@dataclass
+if TYPE_CHECKING:
+    import numpy as np
+
+@dataclass(slots=True, frozen=True)
 class Quote:
     symbol: str
     price: float
@@ -13,15 +16,24 @@ class Quote:
     quantity: float = 0.0
     cost_basis: float = 0.0
 
-@dataclass
-class Point:
-    time: datetime
-    close: float
-
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Series:
     symbol: str
-    points: List[Point]
+    times: "np.ndarray"   # datetime64[s] timestamps
+    closes: "np.ndarray"  # float64 closing prices, aligned with times
+
+@dataclass(slots=True, frozen=True)
+class Portfolio:
+    """Enriched holdings as parallel arrays, one element per lot."""
+    symbols: list[str]
+    quantity: "np.ndarray"       # float64
+    buy_price: "np.ndarray"      # float64
+    total_spent: "np.ndarray"    # float64
+    current_price: "np.ndarray"  # float64, NaN where no quote was available
+    value: "np.ndarray"          # float64, NaN where no quote was available
+    pl: "np.ndarray"             # float64, 0.0 where no quote was available
+    pl_percent: "np.ndarray"     # float64, 0.0 where no quote or nothing spent
+    sources: list[str]
 
 class Config:
     """Global configuration constants for the dashboard."""
@@ -1,90 +1,139 @@
 import csv
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from util.util import normalize_symbol, currency_symbol, safe_float
+from util.util import normalize_symbol, safe_float
+from models import Portfolio
 
 
+PORTFOLIO_DB = Path("src/data/portfolio.db")
+# Holdings lived in this CSV before the sqlite store; it is imported once
 PORTFOLIO_FILE = Path("src/data/portfolio.csv")
 
-def _load_portfolio() -> list[dict]:
-    """Load portfolio holdings from local CSV file."""
-    if PORTFOLIO_FILE.exists():
-        holdings = []
-        with PORTFOLIO_FILE.open(newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                holdings.append({
-                    "symbol": normalize_symbol(row.get("symbol", "")),
-                    "quantity": safe_float(row.get("quantity", 0)),
-                    "buy_price": safe_float(row.get("buy_price", 0.0))
-                })
-        return holdings
-    return []
-
-def _save_portfolio(holdings: list[dict]):
-    """Save portfolio holdings to local CSV file."""
-    PORTFOLIO_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with PORTFOLIO_FILE.open("w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(f, fieldnames=["symbol", "quantity", "buy_price"])
-        writer.writeheader()
-        for h in holdings:
-            writer.writerow(h)
+# One row per lot: the same symbol may be bought several times at different
+# prices, so symbol is indexed rather than used as the primary key
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS holdings (
+    id INTEGER PRIMARY KEY,
+    symbol TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    buy_price REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS holdings_symbol ON holdings (symbol);
+"""
+_INSERT = "INSERT INTO holdings (symbol, quantity, buy_price) VALUES (?, ?, ?)"
+
+# Long-lived pool for per-symbol quote fetches. Reusing its threads across
+# refreshes also reuses each thread's open HTTP connections.
+_QUOTE_POOL = ThreadPoolExecutor(max_workers=16, thread_name_prefix="quote")
+
+# Shared connection, opened on first use. The UI thread writes and worker
+# threads read, so every access goes through _DB_LOCK.
+_DB = None
+_DB_LOCK = threading.Lock()
+
+def _db() -> sqlite3.Connection:
+    """Return the holdings database, creating and seeding it on first use."""
+    global _DB
+    if _DB is None:
+        PORTFOLIO_DB.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(PORTFOLIO_DB, check_same_thread=False)
+        try:
+            with db:
+                db.executescript(_SCHEMA)
+                # user_version 0: the CSV import hasn't completed yet. The rows and
+                # the version bump commit together, so a failed import is retried
+                # on the next start instead of leaving an empty store behind.
+                if db.execute("PRAGMA user_version").fetchone()[0] == 0:
+                    if db.execute("SELECT 1 FROM holdings LIMIT 1").fetchone() is None:
+                        db.executemany(_INSERT, _read_legacy_csv())
+                    db.execute("PRAGMA user_version = 1")
+        except Exception:
+            db.close()
+            raise
+        _DB = db
+    return _DB
+
+def _read_legacy_csv() -> list[tuple[str, float, float]]:
+    """Read holdings from the old portfolio.csv; unparsable numbers become 0.0."""
+    if not PORTFOLIO_FILE.exists():
+        return []
+    with PORTFOLIO_FILE.open(newline="", encoding="utf-8") as f:
+        return [
+            (normalize_symbol(row.get("symbol") or ""),
+             safe_float(row.get("quantity")),
+             safe_float(row.get("buy_price")))
+            for row in csv.DictReader(f)
+        ]
+
+def _load_portfolio() -> list[tuple[str, float, float]]:
+    """Load (symbol, quantity, buy_price) for every lot, in insertion order."""
+    with _DB_LOCK:
+        return _db().execute(
+            "SELECT symbol, quantity, buy_price FROM holdings ORDER BY id"
+        ).fetchall()
 
 def add_holding(symbol: str, quantity: float, buy_price: float):
-    """Add a new holding to the portfolio."""
-    holdings = _load_portfolio()
-    symbol = normalize_symbol(symbol)
-    holdings.append({
-        "symbol": symbol,
-        "quantity": quantity,
-        "buy_price": buy_price
-    })
-    _save_portfolio(holdings)
+    """Add a new holding (lot) to the portfolio."""
+    with _DB_LOCK:
+        db = _db()
+        with db:
+            db.execute(_INSERT, (normalize_symbol(symbol), quantity, buy_price))
 
 def remove_holding(symbol: str):
-    """Remove a holding from the portfolio by symbol."""
-    holdings = _load_portfolio()
-    holdings = [h for h in holdings if h["symbol"] != normalize_symbol(symbol)]
-    _save_portfolio(holdings)
+    """Remove every lot of a symbol from the portfolio."""
+    with _DB_LOCK:
+        db = _db()
+        with db:
+            db.execute("DELETE FROM holdings WHERE symbol = ?", (normalize_symbol(symbol),))
+
+def _safe_quote(api_client, symbol: str):
+    """Fetch a quote for symbol, returning None instead of raising."""
+    try:
+        return api_client.get_quote(symbol)
+    except Exception:
+        return None
 
-def enrich_portfolio(api_client) -> list[dict]:
+def enrich_portfolio(api_client) -> Portfolio:
     """Return portfolio with computed values and live/current prices."""
+    import numpy as np
+
     holdings = _load_portfolio()
-    enriched = []
-    for h in holdings:
-        symbol = h["symbol"]
-        qty = h["quantity"]
-        buy_price = h["buy_price"]
-        total_spent = qty * buy_price
+    symbols = list(dict.fromkeys(h[0] for h in holdings))
+    try:
+        quotes = api_client.get_quotes(symbols)
+    except Exception:
+        # Batch endpoint unavailable: every holding goes through get_quote below
+        quotes = {}
 
-        try:
-            quote = api_client.get_quote(symbol)
-            current_price = quote.price
-            value = qty * current_price
-            pl = value - total_spent
-            pl_percent = (pl / total_spent * 100) if total_spent else 0.0
-            enriched.append({
-                "symbol": symbol,
-                "quantity": qty,
-                "buy_price": buy_price,
-                "total_spent": total_spent,
-                "current_price": current_price,
-                "value": value,
-                "pl": pl,
-                "pl_percent": pl_percent,
-                "currency": currency_symbol(symbol),
-                "source": quote.source
-            })
-        except Exception:
-            enriched.append({
-                "symbol": symbol,
-                "quantity": qty,
-                "buy_price": buy_price,
-                "total_spent": total_spent,
-                "current_price": None,
-                "value": None,
-                "pl": 0.0,
-                "pl_percent": 0.0,
-                "currency": currency_symbol(symbol),
-                "source": "local-cache"
-            })
-    return enriched
\ No newline at end of file
+    # Fetch whatever the batch missed concurrently; these calls are network-bound
+    missing = [s for s in symbols if s not in quotes]
+    if missing:
+        quotes.update(zip(missing, _QUOTE_POOL.map(lambda s: _safe_quote(api_client, s), missing)))
+
+    symbol_list = [h[0] for h in holdings]
+    lot_quotes = [quotes.get(s) for s in symbol_list]
+    qty = np.array([h[1] for h in holdings], dtype=np.float64)
+    buy_price = np.array([h[2] for h in holdings], dtype=np.float64)
+    current_price = np.array(
+        [np.nan if q is None else q.price for q in lot_quotes], dtype=np.float64
+    )
+
+    # One vectorized pass over all lots; NaN prices propagate into value
+    total_spent = qty * buy_price
+    value = qty * current_price
+    pl = np.nan_to_num(value - total_spent, nan=0.0)
+    pl_percent = np.divide(pl * 100, total_spent, out=np.zeros_like(pl), where=total_spent != 0)
+
+    return Portfolio(
+        symbols=symbol_list,
+        quantity=qty,
+        buy_price=buy_price,
+        total_spent=total_spent,
+        current_price=current_price,
+        value=value,
+        pl=pl,
+        pl_percent=pl_percent,
+        sources=["local-cache" if q is None else q.source for q in lot_quotes],
+    )
\ No newline at end of file
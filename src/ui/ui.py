@@ -1,21 +1,77 @@
+import math
 import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
 from tkinter import ttk, Frame, Button, Label, Entry
 from portfolio import enrich_portfolio, add_holding, remove_holding
 from models import  get_client
-from util.util import currency_symbol, fmt_money, fmt_percent
-from util.util import normalize_symbol
-from matplotlib.dates import AutoDateLocator, DateFormatter
-
-
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
+from api import flush_cache
+from util.util import currency_symbol, fmt_money
+from util.util import normalize_symbol, validate_holding, Debouncer
+
+CACHE_FLUSH_MS = 10000  # how often pending quote cache entries are written to disk
+# Series longer than CHART_DOWNSAMPLE_ABOVE are reduced to CHART_POINTS with MinMax-LTTB
+CHART_DOWNSAMPLE_ABOVE = 1500
+CHART_POINTS = 1000
+# Bar size per range; long ranges use coarser bars so far fewer rows are fetched
+CHART_INTERVALS = {"5y": "1wk", "10y": "1wk", "max": "1mo"}
+
+# Bound formatters for the portfolio table, same output as fmt_money/fmt_percent
+_MONEY = "{:.2f}".format
+_PERCENT = "{:.2f}%".format
+
+
+def _on_tk_thread(widget, callback, *args):
+    """
+    Build a Future done-callback that runs callback(future, *args) on the Tk
+    main thread. Network calls run on worker threads, but widgets may only be
+    touched from the thread running mainloop.
+    """
+    def done(future):
+        try:
+            widget.after(0, callback, future, *args)
+        except (RuntimeError, tk.TclError):
+            pass  # window was closed while the call was in flight
+    return done
+
+
+def _portfolio_rows(portfolio):
+    """Format an enriched Portfolio as a list of (Treeview values, colour tag)."""
+    import numpy as np
+
+    pl = portfolio.pl
+    tags = np.where(pl > 0, "green", np.where(pl < 0, "red", "black")).tolist()
+    rows = []
+    for symbol, qty, buy, current, value, p, pct, source, tag in zip(
+        portfolio.symbols,
+        portfolio.quantity.tolist(),
+        portfolio.buy_price.tolist(),
+        portfolio.current_price.tolist(),
+        portfolio.value.tolist(),
+        pl.tolist(),
+        portfolio.pl_percent.tolist(),
+        portfolio.sources,
+        tags,
+    ):
+        if math.isnan(current):
+            # Without a quote, price and value are both unknown
+            current = value = "-"
+        else:
+            current, value = _MONEY(current), _MONEY(value)
+        values = (symbol, qty, _MONEY(buy), current, value, _MONEY(p), _PERCENT(pct), source)
+        rows.append((values, tag))
+    return rows
 
 
 class FinanceDashboard:
     def __init__(self, root):
         self.root = root
         self.api_client = get_client()
-        self._after_id = None
+        # Worker threads for network calls so the Tk main loop never blocks
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        self._flush_id = self.root.after(CACHE_FLUSH_MS, self._flush_cache)
+        self.notebook = None
+        self.portfolio_ui = None
+        self._portfolio_loaded = False
 
         self.root.protocol("WM_DELETE_WINDOW", self.close)
         self._build_tabs()
@@ -24,45 +80,51 @@ class FinanceDashboard:
         quit_btn.pack(pady=10)
 
 
-    def _refresh_data(self):
-        symbol = self.entry.get().strip() or "BTC"
+    def _flush_cache(self):
         try:
-            quote = self.api_client.get_quote(symbol)
-            self.label.config(text=f"{quote.symbol} | Price: ${quote.price:.2f}")
-        except Exception as e:
-            self.label.config(text=f"Error: {e}")
-
-        # Schedule next refresh
-        self._after_id = self.root.after(5000, self._refresh_data)
+            flush_cache()
+        finally:
+            # A failed flush keeps the entries dirty; try again on the next tick
+            self._flush_id = self.root.after(CACHE_FLUSH_MS, self._flush_cache)
 
     def _build_tabs(self):
-        notebook = ttk.Notebook(self.root)
+        self.notebook = notebook = ttk.Notebook(self.root)
         notebook.pack(fill="both", expand=True)
 
         market_tab = Frame(notebook)
-        MarketDataUI(market_tab, self.api_client)
+        MarketDataUI(market_tab, self.api_client, self.executor)
         notebook.add(market_tab, text="Market Data")
 
+        # Widgets only; holdings are fetched the first time the tab is shown
         portfolio_tab = Frame(notebook)
-        PortfolioUI(portfolio_tab, self.api_client)
+        self.portfolio_ui = PortfolioUI(portfolio_tab, self.api_client, self.executor)
         notebook.add(portfolio_tab, text="Portfolio")
+        notebook.bind("<<NotebookTabChanged>>", self._on_tab_changed)
 
+    def _on_tab_changed(self, event):
+        if self._portfolio_loaded:
+            return
+        if self.notebook.tab(self.notebook.select(), "text") == "Portfolio":
+            self._portfolio_loaded = True
+            self.portfolio_ui._refresh_data()
 
 
     def close(self):
         # Cancel any scheduled tasks
-        if self._after_id is not None:
-            self.root.after_cancel(self._after_id)
+        self.root.after_cancel(self._flush_id)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        # Losing unsaved cache entries must not keep the window from closing
+        try:
+            flush_cache()
+        except Exception:
+            pass
+        self.api_client.close()
 
         # Destroy chart canvases if any
         for widget in self.root.winfo_children():
             if isinstance(widget, tk.Widget):
                 widget.destroy()
 
-        # Close matplotlib figures
-        import matplotlib.pyplot as plt
-        plt.close("all")
-
         # Finally destroy root
         self.root.quit()
         self.root.destroy()
@@ -71,15 +133,19 @@ class FinanceDashboard:
 
 
 class PortfolioUI:
-    def __init__(self, parent, api_client):
+    def __init__(self, parent, api_client, executor):
         self.parent = parent
         self.api_client = api_client
+        self.executor = executor
         self.tree = None
         self.symbol_entry = None
         self.qty_entry = None
         self.price_entry = None
+        self.error_label = None
+        self.buttons = []
+        # (symbol, n-th lot of that symbol) -> (item id, values, tag) currently shown
+        self._rows = {}
         self._build_ui()
-        self._refresh_data()
 
     def _build_ui(self):
         control_frame = Frame(self.parent)
@@ -97,9 +163,13 @@ class PortfolioUI:
         self.price_entry = Entry(control_frame, width=8)
         self.price_entry.pack(side="left", padx=5)
 
-        Button(control_frame, text="Add", command=self._add).pack(side="left", padx=5)
-        Button(control_frame, text="Remove", command=self._remove).pack(side="left", padx=5)
-        Button(control_frame, text="Refresh", command=self._refresh_data).pack(side="left", padx=5)
+        for text, command in (("Add", self._add), ("Remove", self._remove), ("Refresh", self._refresh_data)):
+            btn = Button(control_frame, text=text, command=command)
+            btn.pack(side="left", padx=5)
+            self.buttons.append(btn)
+
+        self.error_label = Label(control_frame, fg="red")
+        self.error_label.pack(side="left", padx=5)
 
         columns = (
             "Symbol", "Quantity", "Buy Price", "Current Price",
@@ -111,12 +181,19 @@ class PortfolioUI:
             self.tree.column(col, width=100, anchor="center")
         self.tree.pack(fill="both", expand=True)
 
+        self.tree.tag_configure("green", foreground="green")
+        self.tree.tag_configure("red", foreground="red")
+        self.tree.tag_configure("black", foreground="black")
+
     def _add(self):
         sym = self.symbol_entry.get().strip()
-        qty = float(self.qty_entry.get() or 0)
-        bp = float(self.price_entry.get() or 0)
-        if sym and qty > 0:
-            add_holding(sym, qty, bp)
+        qty = self.qty_entry.get().strip() or 0
+        bp = self.price_entry.get().strip() or 0
+        # Parse once on submit and report bad input next to the form instead of raising
+        ok, error = validate_holding(sym, qty, bp)
+        self.error_label.config(text=error)
+        if ok:
+            add_holding(sym, float(qty), float(bp))
             self._refresh_data()
 
     def _remove(self):
@@ -135,43 +212,75 @@ class PortfolioUI:
         remove_holding(sym)
         self._refresh_data()
 
+    def _set_buttons_state(self, state):
+        for btn in self.buttons:
+            btn.config(state=state)
+
     def _refresh_data(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-
-        enriched = enrich_portfolio(self.api_client)
-        for h in enriched:
-            pl = h["pl"]
-            color = "green" if pl > 0 else "red" if pl < 0 else "black"
-            self.tree.insert(
-                "",
-                "end",
-                values=(
-                    h["symbol"],
-                    h["quantity"],
-                    fmt_money(h["buy_price"]),
-                    fmt_money(h["current_price"]),
-                    fmt_money(h["value"]),
-                    fmt_money(h["pl"]),
-                    fmt_percent(h["pl_percent"]),
-                    h["source"],
-                ),
-                tags=(color,)
-            )
+        # Every button ends in a refresh, so keep them all disabled until it lands
+        self._set_buttons_state("disabled")
+        fut = self.executor.submit(enrich_portfolio, self.api_client)
+        fut.add_done_callback(_on_tk_thread(self.parent, self._apply_portfolio))
 
-        self.tree.tag_configure("green", foreground="green")
-        self.tree.tag_configure("red", foreground="red")
-        self.tree.tag_configure("black", foreground="black")
+    def _apply_portfolio(self, future):
+        self._set_buttons_state("normal")
+        try:
+            rows = _portfolio_rows(future.result())
+        except Exception as e:
+            # Keep the last good table and say why it wasn't updated
+            self.error_label.config(text=f"Refresh failed: {e}")
+            return
+        self.error_label.config(text="")
+
+        # Key rows by symbol plus occurrence, since a symbol can be held in several lots
+        keyed = {}
+        seen = {}
+        for values, color in rows:
+            n = seen[values[0]] = seen.get(values[0], -1) + 1
+            keyed[(values[0], n)] = (values, color)
+
+        # Touch only rows that appeared, disappeared or changed
+        tree = self.tree
+        gone = self._rows.keys() - keyed.keys()
+        if gone:
+            tree.delete(*(self._rows.pop(key)[0] for key in gone))
+        for key, (values, color) in keyed.items():
+            shown = self._rows.get(key)
+            if shown is None:
+                iid = tree.insert("", "end", values=values, tags=(color,))
+            elif shown[1] != values or shown[2] != color:
+                iid = shown[0]
+                tree.item(iid, values=values, tags=(color,))
+            else:
+                continue
+            self._rows[key] = (iid, values, color)
+        # Settle geometry and redraw once for the whole batch, not per row
+        tree.update_idletasks()
 
 
 class MarketDataUI:
-    def __init__(self, parent, api_client):
+    def __init__(self, parent, api_client, executor):
         self.parent = parent
         self.api_client = api_client
+        self.executor = executor
         self.symbol = "BTC-USD"
         self.range = "1mo"
         self.label = None
         self.chart_canvas = None
+        self.load_btn = None
+        self._pending = 0
+        # Bumped on every fetch; results tagged with an older epoch are dropped
+        self._epoch = 0
+        # Full-resolution data of the plotted series (the chart itself may be thinned)
+        self.times = None
+        self.closes = None
+        # Blitting state: the animated price line, the axes background saved after
+        # the last full draw, and the (symbol, period) that draw was for
+        self._line = None
+        self._chart_bg = None
+        self._chart_key = None
+        # Collapses bursts of "Load" clicks into a single fetch
+        self.debouncer = Debouncer(parent, 150)
         self._build_ui()
         self._refresh_data()
 
@@ -184,8 +293,9 @@ class MarketDataUI:
         self.entry.insert(0, self.symbol)
         self.entry.pack(side="left", padx=5)
 
-        Button(control_frame, text="Load & Update Chart",
-               command=self._load_and_update).pack(side="left", padx=5)
+        self.load_btn = Button(control_frame, text="Load & Update Chart",
+                               command=self._load_and_update)
+        self.load_btn.pack(side="left", padx=5)
 
         Label(control_frame, text="Range").pack(side="left", padx=10)
         self.range_var = tk.StringVar(value=self.range)
@@ -199,49 +309,134 @@ class MarketDataUI:
         self.label = Label(self.parent, text="Loading...")
         self.label.pack(anchor="w", padx=10, pady=5)
 
-        fig, ax = plt.subplots(figsize=(6, 3))
+        # matplotlib is imported here rather than at module level to speed up startup
+        import matplotlib as mpl
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
+
+        # Merge near-collinear segments and hand Agg long paths in chunks
+        mpl.rcParams["path.simplify"] = True
+        mpl.rcParams["path.simplify_threshold"] = 1.0
+        mpl.rcParams["agg.path.chunksize"] = 10000
+
+        # A bare Figure stays out of pyplot's global registry and is freed with the widget
+        fig = Figure(figsize=(6, 3))
+        ax = fig.add_subplot(111)
         ax.set_title("Market Chart")
         self.chart_canvas = FigureCanvasTkAgg(fig, master=self.parent)
         self.chart_canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.chart_canvas.mpl_connect("draw_event", self._on_chart_draw)
 
     def _load_and_update(self):
         raw = self.entry.get().strip()
         if raw:
             self.symbol = normalize_symbol(raw)  
-        self._refresh_data()
+        self.debouncer.call(self._refresh_data)
 
 
     def _refresh_data(self):
+        symbol, period = self.symbol, self.range_var.get()
+        # Disabled until both the quote and the series have been applied
+        self.load_btn.config(state="disabled")
+        self._pending = 2
+        self._epoch += 1
+        epoch = self._epoch
+        fut = self.executor.submit(self.api_client.get_quote, symbol)
+        fut.add_done_callback(_on_tk_thread(self.parent, self._apply_quote, epoch, symbol))
+        interval = CHART_INTERVALS.get(period, "1d")
+        fut = self.executor.submit(self.api_client.get_daily, symbol, period, interval)
+        fut.add_done_callback(_on_tk_thread(self.parent, self._apply_series, epoch, symbol, period))
+
+    def _request_done(self):
+        self._pending -= 1
+        if self._pending == 0:
+            self.load_btn.config(state="normal")
+
+    def _apply_quote(self, future, epoch, symbol):
+        if epoch != self._epoch:
+            return  # superseded by a newer fetch
+        self._request_done()
         try:
-            quote = self.api_client.get_quote(self.symbol)
-            text = f"{quote.symbol} | Price: {currency_symbol(self.symbol)}{fmt_money(quote.price)}"
+            quote = future.result()
+            text = f"{quote.symbol} | Price: {currency_symbol(symbol)}{fmt_money(quote.price)}"
             self.label.config(text=text)
+        except Exception as e:
+            self.label.config(text=f"{symbol}: error {e}")
 
-            series = self.api_client.get_daily(self.symbol, self.range_var.get())
-            xs = [p.time for p in series.points]
-            ys = [p.close for p in series.points]
-
-            ax = self.chart_canvas.figure.axes[0]
-            ax.clear()
-            ax.set_title(f"{self.symbol} ({self.range_var.get()})")
-            ax.plot(xs, ys, linewidth=2, color="blue")
-            ax.set_xlabel("Date")
-            ax.set_ylabel("Price")
-            ax.grid(True)
-
-            # Format x-axis dates
-            ax.xaxis.set_major_locator(AutoDateLocator())
-            ax.xaxis.set_major_formatter(DateFormatter("%Y-%m-%d"))
-            self.chart_canvas.figure.autofmt_xdate()
+    def _apply_series(self, future, epoch, symbol, period):
+        if epoch != self._epoch:
+            return  # superseded by a newer fetch; drawing it would go out of order
+        self._request_done()
+        try:
+            series = future.result()
+        except Exception:
+            series = None
+        if series is None or len(series.closes) == 0:
+            self._show_no_data(symbol, period)
+            return
 
-            self.chart_canvas.draw()
+        from matplotlib.dates import AutoDateLocator, DateFormatter
+
+        self.times, self.closes = series.times, series.closes
+        times, closes = series.times, series.closes
+        # Drawing more points than there are pixels only costs time; LTTB keeps
+        # the peaks and troughs a plain stride would drop
+        if len(closes) > CHART_DOWNSAMPLE_ABOVE:
+            from tsdownsample import MinMaxLTTBDownsampler
+
+            idx = MinMaxLTTBDownsampler().downsample(closes, n_out=CHART_POINTS)
+            times, closes = times[idx], closes[idx]
+
+        ax = self.chart_canvas.figure.axes[0]
+        if self._can_blit(ax, symbol, period, times, closes):
+            # Same chart, new data inside the current limits: repaint only the line
+            self.chart_canvas.restore_region(self._chart_bg)
+            self._line.set_data(times, closes)
+            ax.draw_artist(self._line)
+            self.chart_canvas.blit(ax.bbox)
+            return
 
-        except Exception as e:
-            self.label.config(text=f"{self.symbol}: error {e}")
-            ax = self.chart_canvas.figure.axes[0]
-            ax.clear()
-            ax.set_title(f"{self.symbol} ({self.range_var.get()})")
-            ax.text(0.5, 0.5, f"No data available for {self.symbol}",
-                    ha="center", va="center", transform=ax.transAxes)
-            ax.grid(False)
-            self.chart_canvas.draw()
+        ax.clear()
+        ax.set_title(f"{symbol} ({period})")
+        # animated: left out of full draws and painted by _on_chart_draw / blits
+        self._line, = ax.plot(times, closes, linewidth=2, color="blue", animated=True)
+        self._chart_key = (symbol, period)
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Price")
+        ax.grid(True)
+
+        # Format x-axis dates
+        ax.xaxis.set_major_locator(AutoDateLocator())
+        ax.xaxis.set_major_formatter(DateFormatter("%Y-%m-%d"))
+        self.chart_canvas.figure.autofmt_xdate()
+
+        self.chart_canvas.draw()
+
+    def _can_blit(self, ax, symbol, period, times, closes):
+        if self._line is None or self._chart_bg is None or self._chart_key != (symbol, period):
+            return False
+        from matplotlib.dates import date2num
+
+        x0, x1 = ax.get_xlim()
+        y0, y1 = ax.get_ylim()
+        xs = date2num(times)
+        return x0 <= xs[0] and xs[-1] <= x1 and y0 <= closes.min() and closes.max() <= y1
+
+    def _on_chart_draw(self, event):
+        # Runs after every full draw (including resizes): save the background
+        # for later blits and paint the animated line on top of it
+        ax = self.chart_canvas.figure.axes[0]
+        self._chart_bg = self.chart_canvas.copy_from_bbox(ax.bbox)
+        if self._line is not None:
+            ax.draw_artist(self._line)
+
+    def _show_no_data(self, symbol, period):
+        ax = self.chart_canvas.figure.axes[0]
+        ax.clear()
+        self._line = None
+        self._chart_key = None
+        ax.set_title(f"{symbol} ({period})")
+        ax.text(0.5, 0.5, f"No data available for {symbol}",
+                ha="center", va="center", transform=ax.transAxes)
+        ax.grid(False)
+        self.chart_canvas.draw()
@@ -1,27 +1,25 @@
 import csv
-import json
-from dataclasses import asdict, is_dataclass
+import functools
 from datetime import datetime
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional, Tuple
 
+import orjson
+
 # --- Paths ---
 DATA_DIR = Path("src/data")
 
-PORTFOLIO_FILE = DATA_DIR / "portfolio.csv"
 HISTORY_FILE = DATA_DIR / "history.csv"
 CACHE_FILE = DATA_DIR / "cache.json"
 
 def ensure_data_dirs():
     """
     Ensure that the data directory and key files exist.
-    Creates empty portfolio.csv, history.csv, and cache.json if missing.
+    Creates empty history.csv and cache.json if missing; the portfolio
+    database is created by portfolio.py on first use.
     """
     DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-    if not PORTFOLIO_FILE.exists():
-        PORTFOLIO_FILE.write_text("symbol,quantity,buy_price\n", encoding="utf-8")
-
     if not HISTORY_FILE.exists():
         HISTORY_FILE.write_text("symbol,price,change,change_percent,timestamp,source\n", encoding="utf-8")
 
@@ -44,20 +42,17 @@ def log_error(msg: str):
 
 
 # --- Safe parsing ---
+# float()/int() already ignore surrounding whitespace, so no .strip() is needed
 def safe_float(val: Any, default: float = 0.0) -> float:
     try:
-        if isinstance(val, str):
-            val = val.strip()
         return float(val)
-    except Exception:
+    except (TypeError, ValueError, OverflowError):
         return default
 
 def safe_int(val: Any, default: int = 0) -> int:
     try:
-        if isinstance(val, str):
-            val = val.strip()
         return int(val)
-    except Exception:
+    except (TypeError, ValueError, OverflowError):
         return default
 
 
@@ -91,10 +86,15 @@ SYMBOL_ALIASES: Dict[str, str] = {
     "msft": "MSFT",
 }
 
+# Same aliases keyed by upper-case input, so lookups need a single .upper()
+_SYMBOL_ALIASES_UPPER: Dict[str, str] = {k.upper(): v for k, v in SYMBOL_ALIASES.items()}
+
+@functools.lru_cache(maxsize=2048)
 def normalize_symbol(sym: str) -> str:
-    sym = sym.strip().lower()
-    return SYMBOL_ALIASES.get(sym, sym.upper())
+    sym = sym.strip().upper()
+    return _SYMBOL_ALIASES_UPPER.get(sym, sym)
 
+@functools.lru_cache(maxsize=2048)
 def currency_symbol(symbol: str) -> str:
     sym = (symbol or "").upper()
     if sym.endswith("-USD") or sym.endswith("=X") or "USD" in sym:
@@ -122,12 +122,11 @@ def write_csv_dict(path: Path, rows: List[Dict[str, Any]], headers: Optional[Lis
     try:
         if headers is None and rows:
             headers = list(rows[0].keys())
-        with path.open("w", newline="", encoding="utf-8") as f:
+        with path.open("w", newline="", encoding="utf-8", buffering=1 << 18) as f:
             writer = csv.DictWriter(f, fieldnames=headers or [])
             if headers:
                 writer.writeheader()
-            for r in rows:
-                writer.writerow(r)
+            writer.writerows(rows)
         log_info(f"Wrote {len(rows)} rows to {path}")
     except Exception as e:
         log_error(f"Failed to write CSV {path}: {e}")
@@ -138,17 +137,16 @@ def load_json(path: Path, default: Any = None) -> Any:
     if not path.exists():
         return default
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return orjson.loads(path.read_bytes())
     except Exception as e:
         log_warn(f"Failed to load JSON {path}: {e}")
         return default
 
 def save_json(path: Path, obj: Any):
     try:
-        if is_dataclass(obj):
-            obj = asdict(obj)
+        # orjson serializes dataclasses natively, no asdict() copy needed
         path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_text(json.dumps(obj, ensure_ascii=False), encoding="utf-8")
+        path.write_bytes(orjson.dumps(obj))
         log_info(f"Saved JSON to {path}")
     except Exception as e:
         log_error(f"Failed to save JSON {path}: {e}")
@@ -161,7 +159,8 @@ def to_iso(dt: datetime) -> str:
     return dt.strftime(ISO_FORMAT)
 
 def from_iso(s: str) -> datetime:
-    return datetime.strptime(s, ISO_FORMAT)
+    # ISO_FORMAT is an ISO 8601 layout, so the C fromisoformat parser can read it
+    return datetime.fromisoformat(s)
 
 
 # --- Tkinter helpers ---
@@ -177,22 +176,6 @@ class Debouncer:
         self._after_id = self.root.after(self.delay_ms, lambda: fn(*args, **kwargs))
 
 
-# --- Portfolio file helpers ---
-def load_portfolio_rows() -> List[Dict[str, str]]:
-    rows = read_csv_dict(PORTFOLIO_FILE)
-    normalized: List[Dict[str, str]] = []
-    for r in rows:
-        sym = normalize_symbol(r.get("symbol", ""))
-        qty = r.get("quantity", "0")
-        bp = r.get("buy_price", "0")
-        normalized.append({"symbol": sym, "quantity": qty, "buy_price": bp})
-    return normalized
-
-def save_portfolio_rows(rows: List[Dict[str, Any]]):
-    headers = ["symbol", "quantity", "buy_price"]
-    write_csv_dict(PORTFOLIO_FILE, rows, headers=headers)
-
-
 # --- History helpers ---
 def append_history_row(row: Dict[str, Any]):
     HISTORY_FILE.parent.mkdir(parents=True, exist_ok=True)
@@ -211,14 +194,20 @@ def append_history_row(row: Dict[str, Any]):
 
 
 # --- Cache helpers ---
+# api.py owns the single in-memory copy of cache.json; these delegate to it so
+# entries written here and there never overwrite each other on flush.
+# api is imported inside each function because it imports this module.
 def save_quote_cache(symbol: str, quote: Dict[str, Any]):
-    cache = load_json(CACHE_FILE, default={}) or {}
-    cache[symbol] = quote
-    save_json(CACHE_FILE, cache)
+    from api import cache_put
+    cache_put(symbol, quote)
 
 def load_quote_cache(symbol: str) -> Optional[Dict[str, Any]]:
-    cache = load_json(CACHE_FILE, default={}) or {}
-    return cache.get(symbol)
+    from api import cache_get
+    return cache_get(symbol)
+
+def flush_quote_cache():
+    from api import flush_cache
+    flush_cache()
 
 
 # --- Validation helpers ---
@@ -240,25 +229,19 @@ def validate_holding(symbol: str, quantity: Any, buy_price: Any) -> Tuple[bool,
 
 # --- Formatting helpers ---
 def fmt_money(value: Optional[float]) -> str:
-    if value is None:
-        return "-"
-    return f"{value:.2f}"
+    return format(value, ".2f") if value is not None else "-"
 
 def fmt_percent(value: Optional[float]) -> str:
-    if value is None:
-        return "-"
-    return f"{value:.2f}%"
+    return format(value, ".2f") + "%" if value is not None else "-"
 
 def fmt_signed(value: Optional[float]) -> str:
-    if value is None:
-        return "-"
-    sign = "+" if value >= 0 else ""
-    return f"{sign}{value:.2f}"
+    # "+.2f" adds the sign for positives; negatives already carry one
+    return format(value, "+.2f") if value is not None else "-"
 
 def fmt_currency(value: Optional[float], symbol: str = "") -> str:
     if value is None:
         return "-"
-    return f"{symbol}{value:.2f}" if symbol else f"{value:.2f}"
+    return symbol + format(value, ".2f")
 
 
 # --- Math helpers ---
@@ -289,7 +272,6 @@ def safe_str(val: Any, default: str = "") -> str:
 __all__ = [
     # paths & init
     "DATA_DIR",
-    "PORTFOLIO_FILE",
     "HISTORY_FILE",
     "CACHE_FILE",
     "ensure_data_dirs",
@@ -314,13 +296,11 @@ __all__ = [
     "from_iso",
     # tkinter
     "Debouncer",
-    # portfolio IO
-    "load_portfolio_rows",
-    "save_portfolio_rows",
     # history/cache
     "append_history_row",
     "save_quote_cache",
     "load_quote_cache",
+    "flush_quote_cache",
     # validation
     "validate_holding",
     # formatting